@@ -1,7 +1,9 @@
 """
 FastAPI backend for WandB Local Viewer.
 """
+import functools
 import os
+import threading
 from pathlib import Path
 from typing import Annotated
 
@@ -15,11 +17,29 @@ import orjson
 from .run_loader import RunLoader
 
 
-# Initialize app
+# Custom JSON response using orjson for better performance.
+# orjson walks the payload in C: non-string keys and numpy arrays are handled
+# natively, and anything else (e.g. Path) falls back to str() via default=.
+class ORJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            default=str,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        )
+
+
+# Initialize app. FastAPI resolves the default response class per route at
+# registration time, so it must be set here — handlers that return plain
+# Python objects (refresh, run sets, ...) then encode through orjson too,
+# not just the ones that pre-encode bytes via ojson().
 app = FastAPI(
     title="WandB Local Viewer",
     description="Local viewer for wandb experiment logs",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS for development
@@ -34,68 +54,115 @@ app.add_middleware(
 # Global run loader - will be initialized with wandb directory
 _run_loader: RunLoader | None = None
 
+# Set once the loader exists and the initial discovery has finished;
+# lookup endpoints answer 503 until then instead of blocking
+_ready = threading.Event()
+
 
 def get_run_loader() -> RunLoader:
     global _run_loader
     if _run_loader is None:
         raise HTTPException(500, "Run loader not initialized")
+    if not _ready.is_set():
+        raise HTTPException(503, "Run index is still loading")
     return _run_loader
 
 
-def init_run_loader(wandb_dir: str | Path):
-    global _run_loader
+def init_run_loader(wandb_dir: str | Path, background: bool = False):
+    """Set up the run loader (and run-set store) for wandb_dir.
+
+    With background=True the initial run discovery happens in a daemon
+    thread so the server can bind its port immediately; /api/ready
+    reports when the index is usable.
+    """
+    global _run_loader, _run_sets_path
     _run_loader = RunLoader(wandb_dir)
+    _run_sets_path = Path(wandb_dir) / "runsets.json"
+    with _run_sets_lock:
+        _load_run_sets()
+
+    if background:
+        _ready.clear()
+        loader = _run_loader
 
+        def _warm():
+            try:
+                loader.discover_runs()
+            finally:
+                _ready.set()
 
-# Helper to make dict JSON-serializable (convert non-string keys)
-def make_serializable(obj):
-    if isinstance(obj, dict):
-        return {str(k): make_serializable(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [make_serializable(item) for item in obj]
-    elif isinstance(obj, (int, float, str, bool, type(None))):
-        return obj
+        threading.Thread(target=_warm, name="run-loader-init", daemon=True).start()
     else:
-        return str(obj)
+        _ready.set()
 
 
-# Custom JSON response using orjson for better performance
-class ORJSONResponse(Response):
-    media_type = "application/json"
-    
-    def render(self, content) -> bytes:
-        serializable = make_serializable(content)
-        return orjson.dumps(serializable, option=orjson.OPT_SERIALIZE_NUMPY)
+def ojson(payload) -> Response:
+    """Encode a payload with orjson and return it as a raw Response.
+
+    Returning pre-encoded bytes skips FastAPI's jsonable_encoder walk over
+    the payload, which matters for large run/metric responses.
+    """
+    return Response(
+        orjson.dumps(
+            payload,
+            default=str,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+        ),
+        media_type="application/json",
+    )
+
+
+# Media extension -> content type, built once at import
+_MEDIA_CT: dict[str, str] = {
+    '.gif': 'image/gif',
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+}
 
 
 # ============ API Routes ============
 
-@app.get("/api/runs", response_class=ORJSONResponse)
-async def list_runs():
+@app.get("/api/ready")
+async def ready():
+    """Whether the initial run discovery has finished."""
+    return {"ready": _ready.is_set()}
+
+
+@app.get("/api/runs", response_model=None)
+def list_runs():
     """List all discovered runs with metadata."""
     loader = get_run_loader()
     runs = loader.discover_runs()
     
-    # Return run info including config for filtering
-    return [{
-        'id': r['id'],
-        'display_name': r['display_name'],
-        'created_at': r['created_at'],
-        'is_offline': r['is_offline'],
-        'has_videos': r['has_videos'],
-        'state': r['metadata'].get('state') if r['metadata'] else None,
-        'metadata': {
-            'host': r['metadata'].get('host') if r['metadata'] else None,
-            'gpu': r['metadata'].get('gpu') if r['metadata'] else None,
-            'args': r['metadata'].get('args') if r['metadata'] else None,
-            'program': r['metadata'].get('program') if r['metadata'] else None,
-        },
-        'config': r['config'],  # Include full config for filtering
-    } for r in runs]
-
-
-@app.get("/api/runs/{run_id}", response_class=ORJSONResponse)
-async def get_run(run_id: str):
+    # Return run info including config for filtering. Values are JSON-native
+    # at build time (args stringified here, since protobuf may hand us
+    # non-str items), so orjson dumps the list without any pre-pass.
+    payload = []
+    for r in runs:
+        md = r.metadata or {}
+        payload.append({
+            'id': r.id,
+            'display_name': r.display_name,
+            'created_at': r.created_at,
+            'is_offline': r.is_offline,
+            'has_videos': r.has_videos,
+            'state': md.get('state'),
+            'metadata': {
+                'host': md.get('host'),
+                'gpu': md.get('gpu'),
+                'args': list(map(str, md.get('args') or [])) or None,
+                'program': md.get('program'),
+            },
+            'config': r.config,  # Include full config for filtering
+        })
+    return ojson(payload)
+
+
+@app.get("/api/runs/{run_id}", response_model=None)
+def get_run(run_id: str):
     """Get full details for a specific run."""
     loader = get_run_loader()
     run = loader.get_run(run_id)
@@ -103,54 +170,78 @@ async def get_run(run_id: str):
     if not run:
         raise HTTPException(404, f"Run {run_id} not found")
     
-    return run
+    return ojson(run.to_dict())
 
 
-@app.get("/api/runs/{run_id}/metrics", response_class=ORJSONResponse)
-async def get_run_metrics(
+@functools.lru_cache(maxsize=256)
+def _encoded_metrics(run_id: str, keys_tuple: tuple[str, ...] | None, mtime_ns: int) -> bytes:
+    """Extract and orjson-encode metrics for a run, cached per key set.
+
+    mtime_ns is part of the key purely for invalidation: when the .wandb
+    file changes, the stale entry simply stops being hit.
+    """
+    loader = get_run_loader()
+    keys = list(keys_tuple) if keys_tuple is not None else None
+    metrics = loader.get_run_metrics(run_id, keys)
+    # Debug: log metric extraction (cold path only)
+    if metrics:
+        sample_key = next(iter(metrics))
+        print(f"Metrics for {run_id}: {len(metrics)} keys, {len(metrics[sample_key])} data points for '{sample_key}'")
+    return orjson.dumps(
+        metrics,
+        default=str,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+    )
+
+
+@app.get("/api/runs/{run_id}/metrics", response_model=None)
+def get_run_metrics(
     run_id: str,
     keys: Annotated[list[str] | None, Query()] = None,
 ):
     """
     Get time series metrics for a run.
-    
+
     Args:
         run_id: Run identifier
         keys: List of metric keys to return (None = all numeric metrics)
     """
     loader = get_run_loader()
     run = loader.get_run(run_id)
-    
+
     if not run:
         raise HTTPException(404, f"Run {run_id} not found")
-    
-    metrics = loader.get_run_metrics(run_id, keys)
-    # Debug: log metric extraction
-    if metrics:
-        sample_key = list(metrics.keys())[0] if metrics else None
-        if sample_key:
-            print(f"Metrics for {run_id} (display: {run.get('display_name', 'N/A')}): {len(metrics)} keys, {len(metrics[sample_key])} data points for '{sample_key}'")
-    return metrics
-
 
-@app.get("/api/runs/{run_id}/available-metrics", response_class=ORJSONResponse)
-async def get_available_metrics(run_id: str):
+    # Repeat views of an unchanged run reuse the pre-encoded bytes
+    try:
+        mtime_ns = os.stat(run.wandb_file).st_mtime_ns
+    except OSError:
+        mtime_ns = 0
+    keys_tuple = tuple(sorted(keys)) if keys else None
+    return Response(
+        _encoded_metrics(run_id, keys_tuple, mtime_ns),
+        media_type="application/json",
+    )
+
+
+@app.get("/api/runs/{run_id}/available-metrics", response_model=None)
+def get_available_metrics(run_id: str):
     """Get list of available metric keys for a run."""
     loader = get_run_loader()
     metrics = loader.get_available_metrics(run_id)
-    return metrics
+    return ojson(metrics)
 
 
-@app.get("/api/runs/{run_id}/videos", response_class=ORJSONResponse)
-async def get_run_videos(run_id: str):
+@app.get("/api/runs/{run_id}/videos", response_model=None)
+def get_run_videos(run_id: str):
     """Get list of video/gif files for a run."""
     loader = get_run_loader()
     videos = loader.get_run_videos(run_id)
-    return videos
+    return ojson(videos)
 
 
 @app.get("/api/media/{run_id}/{path:path}")
-async def serve_media(run_id: str, path: str):
+def serve_media(run_id: str, path: str):
     """Serve media files (videos, gifs) for a run."""
     loader = get_run_loader()
     run = loader.get_run(run_id)
@@ -159,43 +250,72 @@ async def serve_media(run_id: str, path: str):
         raise HTTPException(404, f"Run {run_id} not found")
     
     # Construct full path
-    run_dir = Path(run['dir'])
+    run_dir = Path(run.dir)
     media_path = run_dir / 'files' / path
-    
-    if not media_path.exists():
+
+    # Single stat for both the existence check and FileResponse headers
+    try:
+        stat_result = os.stat(media_path)
+    except OSError:
         raise HTTPException(404, f"Media file not found: {path}")
-    
+
     # Determine content type
-    suffix = media_path.suffix.lower()
-    content_type = {
-        '.gif': 'image/gif',
-        '.mp4': 'video/mp4',
-        '.webm': 'video/webm',
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-    }.get(suffix, 'application/octet-stream')
-    
-    return FileResponse(media_path, media_type=content_type)
+    content_type = _MEDIA_CT.get(media_path.suffix.lower(), 'application/octet-stream')
+
+    # FileResponse handles Range requests and, when uvicorn advertises the
+    # http.response.pathsend extension, streams the file zero-copy in the
+    # server instead of chunked reads through Python.
+    return FileResponse(media_path, media_type=content_type, stat_result=stat_result)
 
 
 @app.post("/api/refresh")
-async def refresh_runs():
+def refresh_runs():
     """Refresh the run cache."""
     loader = get_run_loader()
     loader.clear_cache()
+    _encoded_metrics.cache_clear()
     runs = loader.discover_runs()
     return {"message": "Cache refreshed", "run_count": len(runs)}
 
 
-@app.get("/api/config-keys", response_class=ORJSONResponse)
-async def get_config_keys():
+@app.get("/api/config-keys", response_model=None)
+def get_config_keys():
     """Get all unique config keys across all runs."""
     loader = get_run_loader()
     # Make sure runs are discovered first
     loader.discover_runs()
     keys = loader.get_all_config_keys()
-    return keys
+    return ojson(keys)
+
+
+class MetricsBatchRequest(BaseModel):
+    run_ids: list[str]
+    keys: list[str] | None = None
+
+
+@app.post("/api/metrics/batch", response_model=None)
+def get_metrics_batch(req: MetricsBatchRequest):
+    """
+    Get metrics for several runs in one request.
+
+    Amortizes the HTTP round trip and JSON envelope over all selected runs;
+    extraction runs in a thread pool since each run parses independently.
+    """
+    import itertools
+    from concurrent.futures import ThreadPoolExecutor
+
+    loader = get_run_loader()
+
+    if not req.run_ids:
+        return ojson({})
+
+    with ThreadPoolExecutor(max_workers=min(8, len(req.run_ids))) as executor:
+        all_metrics = executor.map(
+            loader.get_run_metrics, req.run_ids, itertools.repeat(req.keys)
+        )
+        payload = dict(zip(req.run_ids, all_metrics))
+
+    return ojson(payload)
 
 
 # ============ Run Set Management (stored client-side, but API for future) ============
@@ -207,34 +327,100 @@ class RunSet(BaseModel):
     color: str | None = None
 
 
-# In-memory run sets (could persist to JSON file)
+# Run sets are kept in memory and mirrored to <wandb_dir>/runsets.json so
+# they survive restarts. Each uvicorn worker process holds its own copy, so
+# the file is the shared source of truth: every access re-reads it when its
+# mtime has moved (one stat on the hot path), and the lock serializes
+# concurrent access within a worker.
 _run_sets: dict[str, RunSet] = {}
+_run_sets_path: Path | None = None
+_run_sets_mtime_ns: int | None = None
+_run_sets_lock = threading.Lock()
+
+
+def _load_run_sets():
+    """Replace the in-memory mapping with the on-disk contents."""
+    global _run_sets_mtime_ns
+    _run_sets.clear()
+    _run_sets_mtime_ns = None
+    if _run_sets_path is None:
+        return
+    try:
+        st = os.stat(_run_sets_path)
+    except OSError:
+        return
+    try:
+        for item in orjson.loads(_run_sets_path.read_bytes()):
+            _run_sets[item['id']] = RunSet(**item)
+        _run_sets_mtime_ns = st.st_mtime_ns
+    except Exception as e:
+        print(f"Error loading run sets from {_run_sets_path}: {e}")
+
+
+def _refresh_run_sets():
+    """Re-read runsets.json if another worker has rewritten it.
+
+    Callers must hold _run_sets_lock. A stale-mtime read just means the
+    next access reloads again; the replace in _save_run_sets keeps readers
+    from ever seeing a half-written file.
+    """
+    if _run_sets_path is None:
+        return
+    try:
+        mtime_ns = os.stat(_run_sets_path).st_mtime_ns
+    except OSError:
+        mtime_ns = None
+    if mtime_ns != _run_sets_mtime_ns:
+        _load_run_sets()
+
+
+def _save_run_sets():
+    """Atomically persist the mapping (tmp file + replace, like snapshots)."""
+    global _run_sets_mtime_ns
+    if _run_sets_path is None:
+        return
+    data = orjson.dumps([rs.model_dump() for rs in _run_sets.values()])
+    tmp_path = _run_sets_path.with_name(_run_sets_path.name + '.tmp')
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, _run_sets_path)
+        _run_sets_mtime_ns = os.stat(_run_sets_path).st_mtime_ns
+    except OSError as e:
+        print(f"Error saving run sets to {_run_sets_path}: {e}")
 
 
-@app.get("/api/run-sets", response_class=ORJSONResponse)
-async def list_run_sets():
+@app.get("/api/run-sets", response_model=None)
+def list_run_sets():
     """List all run sets."""
-    return list(_run_sets.values())
+    with _run_sets_lock:
+        _refresh_run_sets()
+        return ojson([rs.model_dump() for rs in _run_sets.values()])
 
 
-@app.post("/api/run-sets", response_class=ORJSONResponse)
-async def create_run_set(run_set: RunSet):
+@app.post("/api/run-sets", response_model=None)
+def create_run_set(run_set: RunSet):
     """Create or update a run set."""
-    _run_sets[run_set.id] = run_set
-    return run_set
+    with _run_sets_lock:
+        _refresh_run_sets()
+        _run_sets[run_set.id] = run_set
+        _save_run_sets()
+    return ojson(run_set.model_dump())
 
 
 @app.delete("/api/run-sets/{set_id}")
-async def delete_run_set(set_id: str):
+def delete_run_set(set_id: str):
     """Delete a run set."""
-    if set_id in _run_sets:
-        del _run_sets[set_id]
-        return {"message": "Deleted"}
+    with _run_sets_lock:
+        _refresh_run_sets()
+        if set_id in _run_sets:
+            del _run_sets[set_id]
+            _save_run_sets()
+            return {"message": "Deleted"}
     raise HTTPException(404, "Run set not found")
 
 
 @app.delete("/api/runs/{run_id}")
-async def delete_run(run_id: str):
+def delete_run(run_id: str):
     """Delete a run folder entirely."""
     import shutil
     
@@ -244,7 +430,7 @@ async def delete_run(run_id: str):
     if not run:
         raise HTTPException(404, f"Run {run_id} not found")
     
-    run_dir = Path(run['dir'])
+    run_dir = Path(run.dir)
     
     if not run_dir.exists():
         raise HTTPException(404, f"Run directory not found: {run_dir}")
@@ -259,8 +445,68 @@ async def delete_run(run_id: str):
         raise HTTPException(500, f"Failed to delete run: {str(e)}")
 
 
+def _find_pids_pgrep(patterns: list[str]) -> tuple[set[int], str | None]:
+    """Fallback PID search via pgrep for hosts without /proc (e.g. macOS)."""
+    import subprocess
+
+    for pattern in patterns:
+        try:
+            result = subprocess.run(
+                ['pgrep', '-f', pattern],
+                capture_output=True,
+                text=True
+            )
+        except Exception:
+            continue
+        if result.returncode == 0 and result.stdout.strip():
+            pids = {int(pid) for pid in result.stdout.split() if pid.strip()}
+            if pids:
+                return pids, pattern
+    return set(), None
+
+
+def _find_pids(patterns: list[str]) -> tuple[set[int], str | None]:
+    """
+    Find PIDs whose command line matches one of the given regex patterns.
+
+    Scans /proc once, testing every pattern against each cmdline, instead of
+    forking a pgrep per pattern. Returns (pids, matched_pattern) for the
+    first pattern (in priority order) that matched anything.
+    """
+    import re as _re
+
+    if not os.path.isdir('/proc'):
+        return _find_pids_pgrep(patterns)
+
+    compiled = []
+    for pattern in patterns:
+        try:
+            compiled.append((pattern, _re.compile(pattern)))
+        except _re.error:
+            continue
+
+    matches: dict[str, set[int]] = {pattern: set() for pattern, _ in compiled}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+        except OSError:
+            continue
+        for pattern, regex in compiled:
+            if regex.search(cmdline):
+                matches[pattern].add(int(entry))
+
+    # Respect the caller's priority order: first pattern with any hit wins
+    for pattern, _ in compiled:
+        if matches[pattern]:
+            return matches[pattern], pattern
+    return set(), None
+
+
 @app.post("/api/runs/{run_id}/stop")
-async def stop_run(run_id: str):
+def stop_run(run_id: str):
     """
     Stop a running run by sending SIGTERM to its process.
     
@@ -268,7 +514,6 @@ async def stop_run(run_id: str):
     in the command line, then sends a graceful termination signal.
     """
     import signal
-    import subprocess
     
     loader = get_run_loader()
     run = loader.get_run(run_id)
@@ -276,7 +521,7 @@ async def stop_run(run_id: str):
     if not run:
         raise HTTPException(404, f"Run {run_id} not found")
     
-    metadata = run.get('metadata')
+    metadata = run.metadata
     if not metadata:
         raise HTTPException(400, f"Run {run_id} has no metadata")
     
@@ -297,7 +542,7 @@ async def stop_run(run_id: str):
     unique_patterns = []
     
     # 1. The display name is usually the experiment name, which appears in -exp argument
-    display_name = run.get('display_name', '')
+    display_name = run.display_name
     if display_name and display_name != run_id and len(display_name) > 5:
         unique_patterns.append(display_name)
     
@@ -316,27 +561,7 @@ async def stop_run(run_id: str):
     # 3. As fallback, combine script name with run_id
     unique_patterns.append(f"{script_name}.*{run_id}")
     
-    pids = set()
-    matched_pattern = None
-    
-    for pattern in unique_patterns:
-        try:
-            # Use pgrep to find processes matching this pattern
-            # -f matches against full command line
-            result = subprocess.run(
-                ['pgrep', '-f', pattern],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0 and result.stdout.strip():
-                found_pids = [int(pid.strip()) for pid in result.stdout.strip().split('\n') if pid.strip()]
-                if found_pids:
-                    pids.update(found_pids)
-                    matched_pattern = pattern
-                    break  # Found a match, stop searching
-        except Exception:
-            continue
+    pids, matched_pattern = _find_pids(unique_patterns)
     
     if not pids:
         # Last resort: show the user what patterns we tried
@@ -1,93 +1,265 @@
 """
 Read wandb .wandb binary log files using the official protobuf format.
 """
-import json
-import numbers
+import mmap
+import os
+import pickle
+import struct
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
 
+import numpy as np
+import orjson
+
+# Prefer the upb protobuf backend; ParseFromString is an order of magnitude
+# faster than the pure-Python runtime. Must be set before the proto import.
+os.environ.setdefault("PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION", "upb")
+
 from wandb.sdk.internal.datastore import DataStore
 from wandb.proto import wandb_internal_pb2
 
+# orjson.JSONDecodeError subclasses ValueError, so handlers catch ValueError
+_loads = orjson.loads
 
-def read_wandb_file(wandb_file_path: str | Path) -> dict[str, Any]:
+# Fixed-width signature header prepended to the on-disk parse cache
+_CACHE_SIG_LEN = 64
+
+
+# LevelDB log framing used by wandb's DataStore
+_LDB_HEADER_LEN = 7
+_LDB_BLOCK_LEN = 32768
+_LDB_FULL, _LDB_FIRST, _LDB_MIDDLE, _LDB_LAST = 1, 2, 3, 4
+_LDB_FILE_HEADER = struct.pack('<4sHB', b':W&B', 0xBEE1, 0)
+
+
+def _iter_raw_records_mmap(wandb_file_path: str | Path):
     """
-    Read a .wandb binary log file and extract all data.
-    
-    Returns:
-        dict with keys: run_info, history, summary, config
+    Yield raw record payloads by slicing the LevelDB log framing off an mmap.
+
+    DataStore.scan_data does per-record Python bookkeeping plus a CRC over
+    every payload; for local files the CRC is skipped and FULL records are
+    yielded as zero-copy memoryviews over the page cache. Raises ValueError
+    up front if the file header doesn't match, so callers can fall back to
+    DataStore.
     """
+    f = open(wandb_file_path, 'rb')
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        f.close()
+        raise ValueError(f"cannot mmap {wandb_file_path}")
+    if mm[:_LDB_HEADER_LEN] != _LDB_FILE_HEADER:
+        mm.close()
+        f.close()
+        raise ValueError(f"not a wandb datastore file: {wandb_file_path}")
+
+    def _gen():
+        try:
+            mv = memoryview(mm)
+            size = len(mm)
+            pos = _LDB_HEADER_LEN
+
+            def read_frame(pos):
+                # Blocks are padded when fewer than 7 bytes remain
+                space_left = _LDB_BLOCK_LEN - pos % _LDB_BLOCK_LEN
+                if space_left < _LDB_HEADER_LEN:
+                    pos += space_left
+                if pos + _LDB_HEADER_LEN > size:
+                    return None
+                _, dlength, dtype = struct.unpack_from('<IHB', mm, pos)
+                pos += _LDB_HEADER_LEN
+                if pos + dlength > size:
+                    return None
+                return pos + dlength, dtype, mv[pos:pos + dlength]
+
+            while True:
+                frame = read_frame(pos)
+                if frame is None:
+                    break
+                pos, dtype, data = frame
+                if dtype == _LDB_FULL:
+                    yield data
+                    continue
+                if dtype != _LDB_FIRST:
+                    break  # padding/corruption; stop at last good record
+                # Fragmented record: FIRST [MIDDLE...] LAST
+                chunks = [data]
+                complete = False
+                while True:
+                    frame = read_frame(pos)
+                    if frame is None:
+                        break
+                    pos, dtype, data = frame
+                    chunks.append(data)
+                    if dtype == _LDB_LAST:
+                        complete = True
+                        break
+                    if dtype != _LDB_MIDDLE:
+                        break
+                if not complete:
+                    break
+                yield b''.join(chunks)
+        finally:
+            mv.release()
+            try:
+                mm.close()
+            except BufferError:
+                # A yielded slice is still alive in the consumer; the map is
+                # unmapped once the last view is released
+                pass
+            f.close()
+
+    return _gen()
+
+
+def _iter_raw_records_datastore(wandb_file_path: str | Path):
+    """Yield raw record payloads via wandb's DataStore (CRC-checked)."""
     ds = DataStore()
     ds.open_for_scan(str(wandb_file_path))
-    
-    run_info = {}
-    history = []
-    summary = {}
-    config = {}
-    
-    count = 0
     while True:
         record_bytes = ds.scan_data()
         if record_bytes is None:
             break
-        
+        yield record_bytes
+
+
+def iter_wandb_records(wandb_file_path: str | Path):
+    """
+    Stream parsed records from a .wandb binary log file.
+
+    Yields:
+        (record_type, record) tuples. The Record instance is reused between
+        iterations to avoid per-record allocation, so consumers must extract
+        what they need before advancing.
+    """
+    try:
+        raw_records = _iter_raw_records_mmap(wandb_file_path)
+    except (OSError, ValueError):
+        raw_records = _iter_raw_records_datastore(wandb_file_path)
+
+    record = wandb_internal_pb2.Record()
+    count = 0
+    for record_bytes in raw_records:
         # Skip header record
         if count == 0:
             count += 1
             continue
-        
+
         try:
-            record = wandb_internal_pb2.Record()
+            record.Clear()
             record.ParseFromString(record_bytes)
             record_type = record.WhichOneof('record_type')
-            
-            if record_type == 'run':
-                run_info = {
-                    'run_id': record.run.run_id,
-                    'display_name': record.run.display_name,
-                    'project': record.run.project,
-                    'entity': record.run.entity,
-                }
-                # Extract config from run record (this is where wandb stores full config)
-                if record.run.config and record.run.config.update:
-                    for item in record.run.config.update:
-                        try:
-                            config[item.key] = json.loads(item.value_json)
-                        except (json.JSONDecodeError, TypeError):
-                            config[item.key] = item.value_json
-                # Extract summary from run record if present
-                if record.run.summary and record.run.summary.update:
-                    for item in record.run.summary.update:
-                        try:
-                            summary[item.key] = json.loads(item.value_json)
-                        except (json.JSONDecodeError, TypeError):
-                            summary[item.key] = item.value_json
-            elif record_type == 'history':
-                row = {}
-                for item in record.history.item:
-                    try:
-                        row[item.key] = json.loads(item.value_json)
-                    except (json.JSONDecodeError, TypeError):
-                        row[item.key] = item.value_json
-                history.append(row)
-            elif record_type == 'summary':
-                for item in record.summary.update:
-                    try:
-                        summary[item.key] = json.loads(item.value_json)
-                    except (json.JSONDecodeError, TypeError):
-                        summary[item.key] = item.value_json
-            elif record_type == 'config':
-                # Also check standalone config records
-                for item in record.config.update:
-                    try:
-                        config[item.key] = json.loads(item.value_json)
-                    except (json.JSONDecodeError, TypeError):
-                        config[item.key] = item.value_json
         except Exception:
-            pass
-        
+            count += 1
+            continue
+
+        yield record_type, record
         count += 1
-    
+
+
+def _parse_cache_path(wandb_file_path: Path) -> Path:
+    return wandb_file_path.with_name('.wandb.parsed.pkl')
+
+
+def read_wandb_file(wandb_file_path: str | Path) -> dict[str, Any]:
+    """
+    Read a .wandb binary log file and extract all data.
+
+    Parsed results are cached on disk next to the file (keyed by mtime+size)
+    so unchanged runs skip the protobuf scan entirely on later reads.
+
+    Returns:
+        dict with keys: run_info, history, summary, config
+    """
+    wandb_file_path = Path(wandb_file_path)
+    try:
+        st = wandb_file_path.stat()
+        sig = f"{st.st_mtime_ns}-{st.st_size}".encode().ljust(_CACHE_SIG_LEN)[:_CACHE_SIG_LEN]
+    except OSError:
+        sig = None
+
+    cache_path = _parse_cache_path(wandb_file_path)
+    if sig is not None:
+        try:
+            raw = cache_path.read_bytes()
+            if raw[:_CACHE_SIG_LEN] == sig:
+                return pickle.loads(raw[_CACHE_SIG_LEN:])
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    result = _parse_wandb_file(wandb_file_path)
+
+    if sig is not None:
+        try:
+            tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+            tmp_path.write_bytes(sig + pickle.dumps(result, protocol=5))
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+
+    return result
+
+
+def _fold_items(items, dest: dict) -> None:
+    """Decode key/value_json item pairs into dest."""
+    for item in items:
+        try:
+            dest[item.key] = _loads(item.value_json)
+        except (ValueError, TypeError):
+            dest[item.key] = item.value_json
+
+
+def _parse_wandb_file(wandb_file_path: Path) -> dict[str, Any]:
+    """Parse a .wandb binary log file record by record (uncached)."""
+    run_info = {}
+    history = []
+    summary = {}
+    config = {}
+
+    def _handle_run(record):
+        run_info.update(
+            run_id=record.run.run_id,
+            display_name=record.run.display_name,
+            project=record.run.project,
+            entity=record.run.entity,
+        )
+        # The run record is where wandb stores the full config, plus an
+        # initial summary snapshot
+        if record.run.config and record.run.config.update:
+            _fold_items(record.run.config.update, config)
+        if record.run.summary and record.run.summary.update:
+            _fold_items(record.run.summary.update, summary)
+
+    def _handle_history(record):
+        row = {}
+        _fold_items(record.history.item, row)
+        history.append(row)
+
+    def _handle_summary(record):
+        _fold_items(record.summary.update, summary)
+
+    def _handle_config(record):
+        # Standalone config records, on top of the run record's config
+        _fold_items(record.config.update, config)
+
+    # Dispatch table built once, outside the scan loop
+    handlers = {
+        'run': _handle_run,
+        'history': _handle_history,
+        'summary': _handle_summary,
+        'config': _handle_config,
+    }
+
+    for record_type, record in iter_wandb_records(wandb_file_path):
+        handler = handlers.get(record_type)
+        if handler is None:
+            continue
+        try:
+            handler(record)
+        except Exception:
+            pass
+
     return {
         'run_info': run_info,
         'history': history,
@@ -96,84 +268,152 @@ def read_wandb_file(wandb_file_path: str | Path) -> dict[str, Any]:
     }
 
 
-def extract_metrics_from_history(history: list[dict], metric_keys: list[str] | None = None) -> dict[str, list]:
+def read_wandb_config_only(wandb_file_path: str | Path) -> dict[str, Any]:
+    """
+    Read only run info, config, and initial summary from a .wandb file.
+
+    The run record (carrying the full config) sits at the start of the file,
+    so scanning stops as soon as it is consumed instead of walking the whole
+    history. Use this when history rows are not needed.
+
+    Returns:
+        dict with keys: run_info, summary, config
+    """
+    run_info = {}
+    summary = {}
+    config = {}
+
+    for record_type, record in iter_wandb_records(wandb_file_path):
+        if record_type == 'config':
+            # Standalone config records can precede the run record
+            _fold_items(record.config.update, config)
+        elif record_type == 'run':
+            run_info = {
+                'run_id': record.run.run_id,
+                'display_name': record.run.display_name,
+                'project': record.run.project,
+                'entity': record.run.entity,
+            }
+            if record.run.config and record.run.config.update:
+                _fold_items(record.run.config.update, config)
+            if record.run.summary and record.run.summary.update:
+                _fold_items(record.run.summary.update, summary)
+            break
+
+    return {
+        'run_info': run_info,
+        'summary': summary,
+        'config': config,
+    }
+
+
+def read_many(paths: list[str | Path], reader=read_wandb_file) -> dict[str, dict[str, Any]]:
+    """
+    Read several .wandb files concurrently with a thread pool.
+
+    File reads and protobuf's C parser release the GIL, so threads overlap
+    disk I/O with decode across runs. Files that fail to parse are omitted.
+
+    Args:
+        paths: .wandb files to read
+        reader: per-file read function, e.g. read_wandb_config_only when
+            history rows are not needed
+
+    Returns:
+        dict mapping str(path) -> parsed result (same shape as reader returns)
+    """
+    if not paths:
+        return {}
+
+    results: dict[str, dict[str, Any]] = {}
+    max_workers = min(32, (os.cpu_count() or 1) * 2, len(paths))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(reader, path): str(path) for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                results[path] = future.result()
+            except Exception as e:
+                print(f"Error reading {path}: {e}")
+
+    return results
+
+
+def _coerce_numeric(value: Any) -> float | None:
+    """Coerce a history value to a float, or None if it isn't numeric."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    if isinstance(value, dict):
+        inner = value.get('value')
+        if inner is not None:
+            return _coerce_numeric(inner)
+    if isinstance(value, (list, tuple)) and len(value) == 1:
+        return _coerce_numeric(value[0])
+    return None
+
+
+def extract_metrics_from_history(history: list[dict] | tuple[dict, ...], metric_keys: list[str] | None = None) -> dict[str, np.ndarray]:
     """
     Extract specific metrics from history into columnar format.
-    
+
     Args:
-        history: List of history row dicts
+        history: Sequence of history row dicts
         metric_keys: List of metric keys to extract (None = all numeric)
-    
+
     Returns:
-        dict mapping metric_key -> list of values
+        dict mapping metric_key -> float64 array of values (NaN for missing;
+        orjson serializes NaN as null so clients still see gaps)
     """
     if not history:
         return {}
-    
+
+    n = len(history)
+
     # Common x-axis keys to always include
     x_axis_keys = {'_step', 'iter', 'info/epochs', 'step', '_timestamp', '_runtime'}
-    
-    # If no keys specified, find all numeric keys
+
+    # If no keys specified, find all numeric keys in a single full scan
     if metric_keys is None:
         metric_keys = set()
-        # Sample more rows to catch metrics that appear later
-        sample_size = min(50, len(history))
-        for row in history[:sample_size]:
+        for row in history:
             for key, value in row.items():
                 if isinstance(value, (int, float)) and not key.startswith('_'):
                     metric_keys.add(key)
-        # If we didn't find many, check all rows
-        if len(metric_keys) < 3 and len(history) > sample_size:
-            for row in history:
-                for key, value in row.items():
-                    if isinstance(value, (int, float)) and not key.startswith('_'):
-                        metric_keys.add(key)
-        metric_keys = sorted(metric_keys)
-    
-    # Ensure we include x-axis keys that exist in data
+
+    # Ensure we include x-axis keys that exist in data (plus _step always)
     all_keys = set(metric_keys) | x_axis_keys
-    
-    result = {key: [] for key in all_keys}
-    result['_step'] = []  # Always include _step
-    
-    def coerce_numeric(value: Any) -> float | None:
-        if isinstance(value, bool):
-            return None
-        if isinstance(value, numbers.Real):
-            return float(value)
-        if isinstance(value, str):
-            try:
-                return float(value)
-            except ValueError:
-                return None
-        if isinstance(value, dict):
-            inner = value.get('value')
-            if inner is not None:
-                return coerce_numeric(inner)
-        if isinstance(value, (list, tuple)) and len(value) == 1:
-            return coerce_numeric(value[0])
-        return None
 
-    # Process all history rows (no truncation)
-    for row in history:
-        result['_step'].append(row.get('_step', len(result['_step'])))
-        for key in all_keys:
-            if key == '_step':
+    # One contiguous float64 buffer per key; NaN marks missing values
+    columns = {key: np.full(n, np.nan, dtype=np.float64) for key in all_keys}
+
+    # Single pass over rows, driven by each row's own (usually sparse) keys
+    for i, row in enumerate(history):
+        for key, value in row.items():
+            if key not in columns:
                 continue
-            value = row.get(key)
-            numeric = coerce_numeric(value)
-            result[key].append(numeric)
-    
+            numeric = _coerce_numeric(value)
+            if numeric is not None:
+                columns[key][i] = numeric
+
+    # _step falls back to the row index where absent
+    step = columns['_step']
+    missing_step = np.isnan(step)
+    if missing_step.any():
+        step[missing_step] = np.nonzero(missing_step)[0]
+
     # Debug: log how many data points we extracted
-    if result and '_step' in result:
-        print(f"Extracted {len(result['_step'])} data points from {len(history)} history rows")
-    
-    # Remove empty x-axis keys (all None values)
-    keys_to_remove = []
-    for key in x_axis_keys:
-        if key in result and all(v is None for v in result[key]):
-            keys_to_remove.append(key)
-    for key in keys_to_remove:
-        del result[key]
-    
-    return result
+    print(f"Extracted {n} data points from {len(history)} history rows")
+
+    # Remove empty x-axis keys (all NaN)
+    for key in x_axis_keys - {'_step'}:
+        if np.isnan(columns[key]).all():
+            del columns[key]
+
+    return columns
@@ -1,14 +1,94 @@
 """
 Load and manage wandb runs from a directory.
 """
-import json
-import yaml
+import hashlib
+import msgspec
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
 from datetime import datetime
 import re
 
-from .datastore_reader import read_wandb_file, extract_metrics_from_history
+# PyYAML and datastore_reader (which pulls in numpy and the wandb proto
+# stack) are imported lazily at first use, keeping this module cheap to
+# import for startup paths that never touch them.
+
+# Reused across all metadata/summary loads; decodes bytes without an
+# intermediate str and is several times faster than stdlib json
+_JSON_DECODER = msgspec.json.Decoder()
+
+# Pattern: run-YYYYMMDD_HHMMSS-runid or offline-run-YYYYMMDD_HHMMSS-runid
+_RUN_DIR_RE = re.compile(r'^(offline-)?run-(\d{8}_\d{6})-([a-z0-9]+)$')
+
+# Epoch number in media filenames like epoch40_4_hash.gif
+_EPOCH_RE = re.compile(r'epoch(\d+)')
+
+# Internal wandb keys that are still useful as plot x-axes
+_METRIC_KEY_ALLOWLIST = frozenset({'_step', '_timestamp', '_runtime'})
+
+def _advise_willneed(path: str) -> None:
+    """Hint the kernel to start readahead on path (no-op where unsupported).
+
+    Later header/history reads then hit the page cache instead of
+    serializing on first-access page faults.
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+
+# Boolean spellings seen in command-line args, checked without lowercasing
+_BOOL_MAP = {'true': True, 'false': False, 'True': True, 'False': False,
+             'TRUE': True, 'FALSE': False}
+
+
+class RunInfo(msgspec.Struct):
+    """A discovered run.
+
+    Fixed-slot struct instead of a dict: a fraction of the memory per run
+    and C-speed attribute access when thousands of runs are listed.
+    """
+    id: str
+    dir: str
+    wandb_file: str
+    is_offline: bool
+    created_at: datetime | None
+    name: str
+    display_name: str
+    metadata: dict | None
+    config: dict | None
+    summary: dict | None
+    media_dir: str
+    has_videos: bool
+
+    def to_dict(self) -> dict:
+        """Plain-dict view for the JSON boundary."""
+        return msgspec.structs.asdict(self)
+
+
+class _DiscoverySnapshot(msgspec.Struct):
+    """On-disk discovery cache: the runs cache plus its validity key."""
+    wandb_dir: str
+    max_mtime_ns: int
+    runs: list[RunInfo]
+
+
+_SNAPSHOT_DECODER = msgspec.msgpack.Decoder(_DiscoverySnapshot)
+
+
+def _snapshot_path(wandb_dir: Path) -> str:
+    """Per-wandb-dir snapshot file under the user cache directory."""
+    digest = hashlib.blake2b(str(wandb_dir).encode(), digest_size=8).hexdigest()
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'lowvr', f'runs_{digest}.msgpack')
 
 
 class RunLoader:
@@ -16,55 +96,225 @@ class RunLoader:
     
     def __init__(self, wandb_dir: str | Path):
         self.wandb_dir = Path(wandb_dir)
-        self._runs_cache: dict[str, dict] = {}
+        self._runs_cache: dict[str, RunInfo] = {}
         self._history_cache: dict[str, dict[str, Any]] = {}
         self._binary_data_cache: dict[str, dict] = {}
+        # Parsed metadata/config/summary keyed by path; invalidated by
+        # (mtime_ns, size) so unchanged files skip re-parsing across
+        # discover_runs calls
+        self._file_cache: dict[str, tuple[int, int, Any]] = {}
+        # Media file listings keyed by media dir, invalidated by dir mtime
+        self._media_cache: dict[str, tuple[int, list[str]]] = {}
+        # Built video dicts keyed by run_id, invalidated by media dir mtime
+        self._videos_cache: dict[str, tuple[int, list[dict]]] = {}
+        # Available-metric lists keyed by run_id, invalidated by .wandb mtime
+        self._metrics_cache: dict[str, tuple[int, list[str]]] = {}
+        # Validity key of the persisted discovery snapshot, if one was
+        # loaded or written this session, plus the directory's inode so a
+        # swapped-out wandb_dir at the same path can't satisfy the key
+        self._snapshot_mtime_ns: int | None = None
+        self._snapshot_ino: int | None = None
+        self._load_snapshot()
     
-    def discover_runs(self) -> list[dict]:
+    def discover_runs(self) -> list[RunInfo]:
         """
         Discover all runs in the wandb directory.
         
         Returns:
-            List of run metadata dicts
+            List of RunInfo structs
         """
+        # Serve straight from the snapshot-backed cache while nothing under
+        # wandb_dir has changed; one stat pass replaces the full re-parse
+        if self._snapshot_mtime_ns is not None:
+            if (self._snapshot_ino == self._dir_ino()
+                    and self._snapshot_mtime_ns == self._max_child_mtime_ns()):
+                runs = sorted(self._runs_cache.values(),
+                              key=lambda x: x.created_at or datetime.min, reverse=True)
+                return runs
+            self._snapshot_mtime_ns = None
+
         runs = []
-        
-        # Pattern: run-YYYYMMDD_HHMMSS-runid or offline-run-YYYYMMDD_HHMMSS-runid
-        run_pattern = re.compile(r'^(offline-)?run-(\d{8}_\d{6})-([a-z0-9]+)$')
-        
-        for run_dir in self.wandb_dir.iterdir():
-            if not run_dir.is_dir():
-                continue
-            
-            match = run_pattern.match(run_dir.name)
-            if not match:
-                continue
-            
-            is_offline = match.group(1) is not None
-            timestamp_str = match.group(2)
-            run_id = match.group(3)
-            
-            # Parse timestamp
-            try:
-                created_at = datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
-            except ValueError:
-                created_at = None
-            
-            # Find .wandb file
-            wandb_files = list(run_dir.glob('run-*.wandb'))
-            if not wandb_files:
-                continue
-            
-            wandb_file = str(wandb_files[0])
-            
-            # Load metadata from files
-            metadata = self._load_metadata(run_dir)
-            config = self._load_config(run_dir)
-            summary = self._load_summary(run_dir)
+
+        # Phase 1: enumerate candidate run dirs with scandir — the name test
+        # runs before any stat, and is_dir uses the dirent type the kernel
+        # already returned rather than a per-entry stat
+        candidates = []
+        with os.scandir(self.wandb_dir) as it:
+            for entry in it:
+                match = _RUN_DIR_RE.match(entry.name)
+                if not match:
+                    continue
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+
+                is_offline = match.group(1) is not None
+                timestamp_str = match.group(2)
+                run_id = match.group(3)
+
+                # Parse timestamp
+                try:
+                    created_at = datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
+                except ValueError:
+                    created_at = None
+
+                # Find .wandb file in one directory pass (no glob machinery)
+                wandb_file = None
+                with os.scandir(entry.path) as files_it:
+                    for file_entry in files_it:
+                        name = file_entry.name
+                        if name.startswith('run-') and name.endswith('.wandb'):
+                            wandb_file = file_entry.path
+                            break
+                if wandb_file is None:
+                    continue
+
+                candidates.append((entry.path, run_id, is_offline, created_at, wandb_file))
+
+        # Phase 2: parse uncached .wandb files in parallel so discovery
+        # overlaps disk reads and protobuf decode across runs. Only the
+        # header (run record + config + initial summary) is read here — the
+        # run record sits at the start of the file, so discovery never scans
+        # history rows that may never be requested. Online runs whose
+        # sidecar config/summary files exist don't need the binary at all,
+        # so they are filtered out with two stats apiece.
+        uncached = {
+            wandb_file: run_id
+            for run_dir, run_id, is_offline, _, wandb_file in candidates
+            if run_id not in self._binary_data_cache
+            and self._needs_binary(run_dir, is_offline)
+        }
+        from .datastore_reader import read_many, read_wandb_config_only
+        for wandb_file, data in read_many(list(uncached), reader=read_wandb_config_only).items():
+            self._binary_data_cache[uncached[wandb_file]] = {
+                'config': data.get('config'),
+                'summary': data.get('summary'),
+                'run_info': data.get('run_info'),
+            }
+
+        # Phase 3: assemble run info per candidate. The per-run work (JSON/
+        # YAML parses, media scan, cache-miss binary reads) is independent
+        # and I/O-bound, so it fans out across a thread pool; results are
+        # collected and assigned to the cache serially afterwards.
+        if candidates:
+            max_workers = min(32, (os.cpu_count() or 1) * 4, len(candidates))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                runs = [
+                    run_info
+                    for run_info in executor.map(self._process_run_dir, candidates)
+                    if run_info is not None
+                ]
+            for run_info in runs:
+                self._runs_cache[run_info.id] = run_info
+
+        # Sort by creation time (newest first)
+        runs.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
+        self._save_snapshot(runs)
+        return runs
+
+    def _dir_ino(self) -> int | None:
+        """Inode of wandb_dir itself, or None when it can't be statted."""
+        try:
+            return os.stat(self.wandb_dir).st_ino
+        except OSError:
+            return None
+
+    def _max_child_mtime_ns(self) -> int:
+        """Newest mtime across wandb_dir entries and run sidecar files.
+
+        Sidecar stats are included because wandb rewrites wandb-summary.json
+        and wandb-metadata.json in place, which does not touch the run
+        directory's own mtime.
+        """
+        newest = 0
+        try:
+            with os.scandir(self.wandb_dir) as it:
+                for entry in it:
+                    try:
+                        mtime_ns = entry.stat(follow_symlinks=False).st_mtime_ns
+                    except OSError:
+                        continue
+                    if mtime_ns > newest:
+                        newest = mtime_ns
+                    if not _RUN_DIR_RE.match(entry.name):
+                        continue
+                    files_dir = os.path.join(entry.path, 'files')
+                    for sidecar in ('wandb-summary.json', 'wandb-metadata.json'):
+                        try:
+                            mtime_ns = os.stat(os.path.join(files_dir, sidecar)).st_mtime_ns
+                        except OSError:
+                            continue
+                        if mtime_ns > newest:
+                            newest = mtime_ns
+        except OSError:
+            pass
+        return newest
+
+    def _load_snapshot(self) -> None:
+        """Populate the runs cache from the on-disk snapshot if still valid."""
+        try:
+            with open(_snapshot_path(self.wandb_dir), 'rb') as f:
+                snapshot = _SNAPSHOT_DECODER.decode(f.read())
+        except (OSError, msgspec.DecodeError):
+            return
+        if snapshot.wandb_dir != str(self.wandb_dir):
+            return
+        if snapshot.max_mtime_ns != self._max_child_mtime_ns():
+            return
+        for run_info in snapshot.runs:
+            self._runs_cache[run_info.id] = run_info
+        self._snapshot_mtime_ns = snapshot.max_mtime_ns
+        self._snapshot_ino = self._dir_ino()
+
+    def _save_snapshot(self, runs: list[RunInfo]) -> None:
+        """Atomically persist the discovery result for the next startup."""
+        max_mtime_ns = self._max_child_mtime_ns()
+        path = _snapshot_path(self.wandb_dir)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            payload = msgspec.msgpack.encode(
+                _DiscoverySnapshot(str(self.wandb_dir), max_mtime_ns, runs))
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._snapshot_mtime_ns = max_mtime_ns
+        self._snapshot_ino = self._dir_ino()
+
+    @staticmethod
+    def _needs_binary(run_dir: str, is_offline: bool) -> bool:
+        """Whether a run's .wandb header must be read during discovery."""
+        if is_offline:
+            return True
+        files_dir = os.path.join(run_dir, 'files')
+        return not (
+            os.path.exists(os.path.join(files_dir, 'config.yaml'))
+            and os.path.exists(os.path.join(files_dir, 'wandb-summary.json'))
+        )
+
+    def _process_run_dir(self, candidate: tuple) -> RunInfo | None:
+        """Build the RunInfo for one candidate run directory."""
+        run_dir, run_id, is_offline, created_at, wandb_file = candidate
+        try:
+            # Kick off readahead on the binary log from inside the pool so
+            # a later header or history read doesn't pay cold-disk latency
+            _advise_willneed(wandb_file)
+
+            # One join per run; the sidecar loaders work on plain strings so
+            # the hot path allocates no PurePath objects
+            files_dir = os.path.join(run_dir, 'files')
+            metadata = self._load_metadata(files_dir)
+            config = self._load_config(files_dir)
+            summary = self._load_summary(files_dir)
             
-            # For offline runs (or if config missing), try to get from binary file
+            # For offline runs (or if config/summary missing), try to get
+            # from the binary file; online runs with intact sidecars skip
+            # the read entirely
             binary_run_info = None
-            binary_data = self._get_binary_data(run_id, wandb_file)
+            binary_data = None
+            if is_offline or not config or not summary:
+                binary_data = self._get_binary_header(run_id, wandb_file)
             if binary_data:
                 # Binary config from run record has full config (like wandb sync uses)
                 binary_config = binary_data.get('config')
@@ -85,35 +335,48 @@ class RunLoader:
             if not config:
                 config = self._build_config_from_args(metadata)
             
-            run_info = {
-                'id': run_id,
-                'dir': str(run_dir),
-                'wandb_file': wandb_file,
-                'is_offline': is_offline,
-                'created_at': created_at.isoformat() if created_at else None,
-                'name': metadata.get('program', '').split('/')[-1] if metadata else run_id,
-                'display_name': self._get_display_name(run_id, config, metadata, binary_run_info),
-                'metadata': metadata,
-                'config': config,
-                'summary': summary,
-                'media_dir': str(run_dir / 'files' / 'media'),
-                'has_videos': self._has_videos(run_dir),
-            }
-            
-            runs.append(run_info)
-            self._runs_cache[run_id] = run_info
-        
-        # Sort by creation time (newest first)
-        runs.sort(key=lambda x: x['created_at'] or '', reverse=True)
-        return runs
+            display_name = self._get_display_name(run_id, config, metadata, binary_run_info)
+            if display_name == run_id and binary_data is None:
+                # The sidecars carried no usable name; one lazy header read
+                # can still recover the display_name from the run record
+                binary_data = self._get_binary_header(run_id, wandb_file)
+                if binary_data:
+                    display_name = self._get_display_name(
+                        run_id, config, metadata, binary_data.get('run_info'))
+
+            media_dir = os.path.join(files_dir, 'media')
+            return RunInfo(
+                id=run_id,
+                dir=run_dir,
+                wandb_file=wandb_file,
+                is_offline=is_offline,
+                # Kept as a datetime; orjson serializes it to ISO 8601 at
+                # the API boundary without a per-run isoformat() call
+                created_at=created_at,
+                name=metadata.get('program', '').rpartition('/')[2] if metadata else run_id,
+                display_name=display_name,
+                metadata=metadata,
+                config=config,
+                summary=summary,
+                media_dir=media_dir,
+                has_videos=self._has_videos(media_dir),
+            )
+        except Exception as e:
+            print(f"Error processing run dir {run_dir}: {e}")
+            return None
     
-    def _get_binary_data(self, run_id: str, wandb_file: str) -> dict | None:
-        """Get config/summary from binary .wandb file (cached)."""
+    def _get_binary_header(self, run_id: str, wandb_file: str) -> dict | None:
+        """Get run_info/config/summary from the start of a .wandb file (cached).
+
+        Stops scanning at the run record; the full history pass happens only
+        in get_run_history via read_wandb_file.
+        """
         if run_id in self._binary_data_cache:
             return self._binary_data_cache[run_id]
         
         try:
-            data = read_wandb_file(wandb_file)
+            from .datastore_reader import read_wandb_config_only
+            data = read_wandb_config_only(wandb_file)
             result = {
                 'config': data.get('config'),
                 'summary': data.get('summary'),
@@ -125,43 +388,56 @@ class RunLoader:
             print(f"Error reading binary data for {run_id}: {e}")
             return None
     
-    def _load_metadata(self, run_dir: Path) -> dict | None:
+    def _read_cached(self, path: str, parser) -> Any:
+        """Parse a file through the (mtime_ns, size)-keyed cache.
+
+        One stat decides between the cached parse and a re-read; missing or
+        unparseable files cache None so repeated discovery doesn't retry
+        them until the file changes.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self._file_cache.get(path)
+        if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        try:
+            with open(path, 'rb') as f:
+                parsed = parser(f.read())
+        except Exception:
+            parsed = None
+        self._file_cache[path] = (st.st_mtime_ns, st.st_size, parsed)
+        return parsed
+
+    @staticmethod
+    def _parse_config(data: bytes) -> dict:
+        import yaml
+        try:
+            from yaml import CSafeLoader as Loader  # libyaml, ~10x faster
+        except ImportError:
+            from yaml import SafeLoader as Loader
+        config = yaml.load(data, Loader=Loader)
+        # Flatten wandb config format
+        flattened = {}
+        for key, value in config.items():
+            if isinstance(value, dict) and 'value' in value:
+                flattened[key] = value['value']
+            else:
+                flattened[key] = value
+        return flattened
+
+    def _load_metadata(self, files_dir: str) -> dict | None:
         """Load wandb-metadata.json"""
-        metadata_file = run_dir / 'files' / 'wandb-metadata.json'
-        if metadata_file.exists():
-            try:
-                return json.loads(metadata_file.read_text())
-            except Exception:
-                pass
-        return None
+        return self._read_cached(os.path.join(files_dir, 'wandb-metadata.json'), _JSON_DECODER.decode)
     
-    def _load_config(self, run_dir: Path) -> dict | None:
+    def _load_config(self, files_dir: str) -> dict | None:
         """Load config.yaml"""
-        config_file = run_dir / 'files' / 'config.yaml'
-        if config_file.exists():
-            try:
-                config = yaml.safe_load(config_file.read_text())
-                # Flatten wandb config format
-                flattened = {}
-                for key, value in config.items():
-                    if isinstance(value, dict) and 'value' in value:
-                        flattened[key] = value['value']
-                    else:
-                        flattened[key] = value
-                return flattened
-            except Exception:
-                pass
-        return None
+        return self._read_cached(os.path.join(files_dir, 'config.yaml'), self._parse_config)
     
-    def _load_summary(self, run_dir: Path) -> dict | None:
+    def _load_summary(self, files_dir: str) -> dict | None:
         """Load wandb-summary.json"""
-        summary_file = run_dir / 'files' / 'wandb-summary.json'
-        if summary_file.exists():
-            try:
-                return json.loads(summary_file.read_text())
-            except Exception:
-                pass
-        return None
+        return self._read_cached(os.path.join(files_dir, 'wandb-summary.json'), _JSON_DECODER.decode)
     
     def _build_config_from_args(self, metadata: dict | None) -> dict:
         """Build a nested config dict from command-line args."""
@@ -178,19 +454,17 @@ class RunLoader:
                 continue
             key_path, value = arg.split('=', 1)
             
-            # Parse value
-            try:
-                # Try to parse as number or bool
-                if value.lower() == 'true':
-                    parsed_value = True
-                elif value.lower() == 'false':
-                    parsed_value = False
-                elif '.' in value:
-                    parsed_value = float(value)
-                else:
+            # Parse value: bool lookup, then int -> float -> str cast ladder
+            # (no .lower() temporaries, no '.'-in-string heuristic)
+            parsed_value = _BOOL_MAP.get(value)
+            if parsed_value is None:
+                try:
                     parsed_value = int(value)
-            except ValueError:
-                parsed_value = value
+                except ValueError:
+                    try:
+                        parsed_value = float(value)
+                    except ValueError:
+                        parsed_value = value
             
             # Build nested dict
             # Convert key like 'task.rew_cfg.obj_dist_weight' to nested structure
@@ -241,14 +515,47 @@ class RunLoader:
         
         return run_id
     
-    def _has_videos(self, run_dir: Path) -> bool:
+    def _scan_media_files(self, media_dir: str | Path) -> list[str]:
+        """List video/gif file paths under media_dir (cached by dir mtime).
+
+        One iterative scandir walk replaces the two recursive rglob passes;
+        hidden directories are skipped. The listing is shared between
+        _has_videos and get_run_videos.
+        """
+        key = str(media_dir)
+        try:
+            mtime_ns = os.stat(key).st_mtime_ns
+        except OSError:
+            return []
+
+        cached = self._media_cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        files = []
+        stack = [key]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.name.startswith('.'):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.endswith(('.gif', '.mp4')):
+                            files.append(entry.path)
+            except OSError:
+                continue
+
+        self._media_cache[key] = (mtime_ns, files)
+        return files
+
+    def _has_videos(self, media_dir: str) -> bool:
         """Check if run has video/gif files."""
-        media_dir = run_dir / 'files' / 'media'
-        if media_dir.exists():
-            return any(media_dir.rglob('*.gif')) or any(media_dir.rglob('*.mp4'))
-        return False
+        return bool(self._scan_media_files(media_dir))
     
-    def get_run(self, run_id: str) -> dict | None:
+    def get_run(self, run_id: str) -> RunInfo | None:
         """Get a specific run by ID."""
         if run_id in self._runs_cache:
             return self._runs_cache[run_id]
@@ -257,39 +564,51 @@ class RunLoader:
         self.discover_runs()
         return self._runs_cache.get(run_id)
     
-    def get_run_history(self, run_id: str, force_reload: bool = False) -> list[dict]:
+    def get_run_history(self, run_id: str, force_reload: bool = False) -> tuple[dict, ...]:
         """
         Get the full history (time series) for a run.
         This reads the .wandb binary file.
+
+        Returns a tuple so the cached history can be shared between callers
+        without defensive copying.
         """
         run = self.get_run(run_id)
         if not run:
-            return []
-        
-        wandb_file = run.get('wandb_file')
-        if not wandb_file or not Path(wandb_file).exists():
-            return []
+            return ()
+
+        wandb_file = run.wandb_file
+        try:
+            st = os.stat(wandb_file)
+        except OSError:
+            return ()
 
-        wandb_path = Path(wandb_file)
-        mtime = wandb_path.stat().st_mtime
+        # mtime_ns catches writes within the same second that a float mtime
+        # would miss; size catches truncation either way
         cached = self._history_cache.get(run_id)
-        if cached and not force_reload and cached.get('mtime') == mtime:
-            return cached.get('history', [])
-        
+        if (cached and not force_reload
+                and cached['mtime_ns'] == st.st_mtime_ns
+                and cached['size'] == st.st_size):
+            return cached['history']
+
         try:
+            from .datastore_reader import read_wandb_file
             data = read_wandb_file(wandb_file)
-            history = data.get('history', [])
+            history = tuple(data.get('history', []))
             if not history:
                 print(f"Warning: No history found in wandb file for {run_id}: {wandb_file}")
             else:
-                print(f"Loaded {len(history)} history rows for {run_id} (display_name: {run.get('display_name', 'N/A')})")
-            self._history_cache[run_id] = {'history': history, 'mtime': mtime}
+                print(f"Loaded {len(history)} history rows for {run_id} (display_name: {run.display_name})")
+            self._history_cache[run_id] = {
+                'history': history,
+                'mtime_ns': st.st_mtime_ns,
+                'size': st.st_size,
+            }
             return history
         except Exception as e:
             print(f"Error reading history for {run_id}: {e}")
             import traceback
             traceback.print_exc()
-            return []
+            return ()
     
     def get_run_metrics(
         self, 
@@ -303,70 +622,109 @@ class RunLoader:
         if not history:
             print(f"Warning: No history for {run_id} when getting metrics")
             return {}
+        from .datastore_reader import extract_metrics_from_history
         metrics = extract_metrics_from_history(history, metric_keys)
         return metrics
     
     def get_available_metrics(self, run_id: str) -> list[str]:
-        """Get list of available numeric metrics for a run."""
+        """Get list of available numeric metrics for a run (cached)."""
+        mtime_ns = self._wandb_file_mtime(run_id)
+        cached = self._metrics_cache.get(run_id)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
         history = self.get_run_history(run_id)
         if not history:
             print(f"No history available for {run_id}")
             return []
         
-        metrics = set()
-        # Check more rows to catch metrics that appear later, or all rows if less than 100
+        # Union the sample's keys at C level, then test the type of the first
+        # value seen per key, instead of an isinstance check on every cell
         sample_size = min(100, len(history))
-        for row in history[:sample_size]:
-            for key, value in row.items():
-                # Include numeric values, excluding internal wandb keys
-                # But allow some common metric patterns that start with letters/numbers
-                if isinstance(value, (int, float)):
-                    # Exclude internal wandb keys like _step, _timestamp, _runtime
-                    # But include metrics that might have underscores in the middle
-                    if not key.startswith('_') or key in ['_step', '_timestamp', '_runtime']:
+        sample = history[:sample_size]
+        sample_keys = set().union(*(row.keys() for row in sample))
+
+        metrics = set()
+        for key in sample_keys:
+            # Exclude internal wandb keys like _gpu stats, but keep the
+            # x-axis allowlist; metrics with underscores mid-key pass through
+            if key.startswith('_') and key not in _METRIC_KEY_ALLOWLIST:
+                continue
+            for row in sample:
+                if key in row:
+                    if type(row[key]) in (int, float):
                         metrics.add(key)
-        
-        # If we didn't find many metrics, try checking all rows
+                    break
+
+        # If we didn't find many metrics, check keys that only appear later
         if len(metrics) < 3 and len(history) > sample_size:
-            for row in history:
-                for key, value in row.items():
-                    if isinstance(value, (int, float)) and not key.startswith('_'):
-                        metrics.add(key)
+            extra_keys = set().union(*(row.keys() for row in history)) - sample_keys
+            for key in extra_keys:
+                if key.startswith('_'):
+                    continue
+                for row in history:
+                    value = row.get(key)
+                    if value is not None:
+                        if type(value) in (int, float):
+                            metrics.add(key)
+                        break
         
         result = sorted(metrics)
         if not result:
             print(f"Warning: No metrics found in history for {run_id}. History has {len(history)} rows.")
             if history:
                 print(f"Sample row keys: {list(history[0].keys())[:10]}")
-        
+
+        self._metrics_cache[run_id] = (mtime_ns, result)
         return result
     
+    def _wandb_file_mtime(self, run_id: str) -> int:
+        """mtime_ns of a run's .wandb file (0 when unknown), for cache keys."""
+        run = self.get_run(run_id)
+        if run:
+            try:
+                return os.stat(run.wandb_file).st_mtime_ns
+            except OSError:
+                pass
+        return 0
+
     def get_run_videos(self, run_id: str) -> list[dict]:
-        """Get list of video/gif files for a run."""
+        """Get list of video/gif files for a run (cached)."""
         run = self.get_run(run_id)
         if not run:
             return []
-        
+
+        try:
+            media_mtime_ns = os.stat(run.media_dir).st_mtime_ns
+        except OSError:
+            media_mtime_ns = 0
+        cached = self._videos_cache.get(run_id)
+        if cached is not None and cached[0] == media_mtime_ns:
+            return cached[1]
+
         videos = []
-        media_dir = Path(run['media_dir'])
-        
-        if media_dir.exists():
-            for gif_file in sorted(media_dir.rglob('*.gif')):
-                # Extract epoch from filename like epoch40_4_hash.gif
-                name = gif_file.stem
-                epoch_match = re.search(r'epoch(\d+)', name)
-                epoch = int(epoch_match.group(1)) if epoch_match else None
-                
-                videos.append({
-                    'path': str(gif_file),
-                    'filename': gif_file.name,
-                    'name': name,
-                    'epoch': epoch,
-                    'relative_path': str(gif_file.relative_to(Path(run['dir']) / 'files')),
-                })
+        files_dir = Path(run.dir) / 'files'
+
+        for path in sorted(self._scan_media_files(run.media_dir)):
+            if not path.endswith('.gif'):
+                continue
+            gif_file = Path(path)
+            # Extract epoch from filename like epoch40_4_hash.gif
+            name = gif_file.stem
+            epoch_match = _EPOCH_RE.search(name)
+            epoch = int(epoch_match.group(1)) if epoch_match else None
+
+            videos.append({
+                'path': path,
+                'filename': gif_file.name,
+                'name': name,
+                'epoch': epoch,
+                'relative_path': str(gif_file.relative_to(files_dir)),
+            })
         
         # Sort by epoch
         videos.sort(key=lambda x: x['epoch'] if x['epoch'] is not None else float('inf'))
+        self._videos_cache[run_id] = (media_mtime_ns, videos)
         return videos
     
     def get_all_config_keys(self) -> list[str]:
@@ -374,7 +732,7 @@ class RunLoader:
         all_keys = set()
         
         for run_id, run in self._runs_cache.items():
-            config = run.get('config')
+            config = run.config
             if config:
                 self._flatten_keys(config, '', all_keys)
         
@@ -385,12 +743,16 @@ class RunLoader:
         )
     
     def _flatten_keys(self, obj: Any, prefix: str, keys: set):
-        """Recursively flatten nested dict keys."""
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                full_key = f"{prefix}.{key}" if prefix else key
+        """Flatten nested dict keys with an explicit stack (no recursion)."""
+        stack = [(obj, prefix)]
+        while stack:
+            current, current_prefix = stack.pop()
+            if not isinstance(current, dict):
+                continue
+            for key, value in current.items():
+                full_key = key if not current_prefix else current_prefix + '.' + key
                 if isinstance(value, dict):
-                    self._flatten_keys(value, full_key, keys)
+                    stack.append((value, full_key))
                 else:
                     keys.add(full_key)
     
@@ -410,3 +772,11 @@ class RunLoader:
         self._runs_cache.clear()
         self._history_cache.clear()
         self._binary_data_cache.clear()
+        self._file_cache.clear()
+        self._media_cache.clear()
+        self._videos_cache.clear()
+        self._metrics_cache.clear()
+        # Force the next discover_runs to rescan rather than trust the
+        # persisted snapshot
+        self._snapshot_mtime_ns = None
+        self._snapshot_ino = None
@@ -120,6 +120,23 @@ export function useMultiRunMetrics(runIds: string[], keys?: string[]) {
     queryKey: ['multi-metrics', runIds, allKeys],
     queryFn: async () => {
       const results = new Map()
+
+      // One batched request amortizes the HTTP round trip across runs
+      if (runIds.length >= 2) {
+        const res = await fetch('/api/metrics/batch', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ run_ids: runIds, keys: allKeys ?? null }),
+        })
+        if (res.ok) {
+          const data = await res.json()
+          for (const [runId, metrics] of Object.entries(data)) {
+            results.set(runId, metrics)
+          }
+        }
+        return results
+      }
+
       const queryString = allKeys?.length
         ? '?' + allKeys.map((k) => `keys=${encodeURIComponent(k)}`).join('&')
         : ''
@@ -7,98 +7,348 @@ Usage:
 
 Then access at http://localhost:8765 (or forward the port from your server)
 """
-import argparse
+import gzip
+import hashlib
+import mimetypes
+import os
+import stat
 import sys
 from pathlib import Path
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIST = os.path.join(_HERE, "frontend", "dist")
+
+# Assets above this size are served from disk instead of RAM
+_STATIC_MAX_CACHED = 2 * 1024 * 1024
+
+# Worth compressing once at startup; image/font formats are already packed
+_COMPRESSIBLE_SUFFIXES = ('.html', '.js', '.css', '.svg', '.json', '.map', '.txt')
+
+_USAGE = (
+    "usage: run.py [-h] [--port PORT] [--host HOST] [--workers N] [--http2]\n"
+    "              [--certfile FILE] [--keyfile FILE] wandb_dir\n"
+)
+
+_HELP = _USAGE + """
+Launch WandB Local Viewer
+
+positional arguments:
+  wandb_dir          Path to wandb directory containing run folders
+
+options:
+  -h, --help         show this help message and exit
+  --port, -p PORT    Port to run the server on (default: 8765)
+  --host HOST        Host to bind to (default: 0.0.0.0)
+  --workers N        Number of worker processes (default: min(4, CPU count))
+  --http2            Serve over HTTP/2 via hypercorn (needs the hypercorn
+                     package; use --certfile/--keyfile for TLS)
+  --certfile FILE    TLS certificate file for --http2
+  --keyfile FILE     TLS private key file for --http2
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="Launch WandB Local Viewer",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
 Examples:
-    # Basic usage
-    python run.py /path/to/project/wandb
-    
-    # Custom port
-    python run.py /path/to/project/wandb --port 9000
-    
-    # Then on your local machine, forward the port:
-    ssh -L 8765:localhost:8765 user@server
-    
-    # And open http://localhost:8765 in your browser
-        """
-    )
-    parser.add_argument(
-        "wandb_dir",
-        type=str,
-        help="Path to wandb directory containing run folders"
-    )
-    parser.add_argument(
-        "--port", "-p",
-        type=int,
-        default=8765,
-        help="Port to run the server on (default: 8765)"
-    )
-    parser.add_argument(
-        "--host",
-        type=str,
-        default="0.0.0.0",
-        help="Host to bind to (default: 0.0.0.0)"
-    )
-    
-    args = parser.parse_args()
-    
-    # Validate wandb directory
-    wandb_dir = Path(args.wandb_dir).resolve()
-    if not wandb_dir.exists():
+  # Basic usage
+  python run.py /path/to/project/wandb
+
+  # Custom port
+  python run.py /path/to/project/wandb --port 9000
+
+  # Then on your local machine, forward the port:
+  ssh -L 8765:localhost:8765 user@server
+
+  # And open http://localhost:8765 in your browser
+"""
+
+
+def _parse_argv(argv: list[str]):
+    """Tiny hand-rolled CLI parser over sys.argv.
+
+    argparse spends milliseconds on import plus parser and help-formatter
+    construction at every launch; for this handful of flags a direct loop
+    with a constant help string does the same job. Accepts both
+    '--port 9000' and '--port=9000' spellings.
+    """
+    from types import SimpleNamespace
+
+    args = {
+        "wandb_dir": None,
+        "port": 8765,
+        "host": "0.0.0.0",
+        "workers": min(4, os.cpu_count() or 1),
+        "http2": False,
+        "certfile": None,
+        "keyfile": None,
+    }
+    positional = []
+    it = iter(argv[1:])
+    for tok in it:
+        value = None
+        if tok.startswith("--") and "=" in tok:
+            tok, value = tok.split("=", 1)
+        try:
+            if tok in ("-h", "--help"):
+                sys.stdout.write(_HELP)
+                sys.exit(0)
+            elif tok in ("-p", "--port"):
+                args["port"] = int(value if value is not None else next(it))
+            elif tok == "--host":
+                args["host"] = value if value is not None else next(it)
+            elif tok == "--workers":
+                args["workers"] = int(value if value is not None else next(it))
+            elif tok == "--http2":
+                args["http2"] = True
+            elif tok == "--certfile":
+                args["certfile"] = value if value is not None else next(it)
+            elif tok == "--keyfile":
+                args["keyfile"] = value if value is not None else next(it)
+            elif tok.startswith("-") and tok != "-":
+                sys.stderr.write(_USAGE + f"run.py: error: unrecognized argument: {tok}\n")
+                sys.exit(2)
+            else:
+                positional.append(tok)
+        except StopIteration:
+            sys.stderr.write(_USAGE + f"run.py: error: {tok} expects a value\n")
+            sys.exit(2)
+        except ValueError:
+            sys.stderr.write(_USAGE + f"run.py: error: {tok} expects an integer\n")
+            sys.exit(2)
+    if len(positional) != 1:
+        sys.stderr.write(_USAGE + "run.py: error: exactly one wandb_dir is required\n")
+        sys.exit(2)
+    args["wandb_dir"] = positional[0]
+    return SimpleNamespace(**args)
+
+
+def _walk_files(root: str):
+    """Yield (path, stat_result) for every file under root.
+
+    scandir's dirent carries the stat from the directory read itself, so
+    unlike os.walk + getsize there is no extra stat syscall per file.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        with os.scandir(current) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    yield entry.path, entry.stat()
+
+
+def _load_static_assets(dist_dir: str) -> dict[str, tuple[bytes, bytes | None, bytes | None, str, str]]:
+    """Read every small file under dist_dir into memory.
+
+    Text-like assets are also gzip- (and, when the brotli package is
+    installed, brotli-) compressed once here, so requests never pay for
+    per-hit compression middleware.
+
+    Returns a dict mapping url path (relative, '/'-separated) to
+    (raw, gzipped or None, brotli or None, content_type, etag).
+    """
+    assets = {}
+    for file_path, st in _walk_files(dist_dir):
+        if st.st_size > _STATIC_MAX_CACHED:
+            continue
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            continue
+        rel_url = os.path.relpath(file_path, dist_dir).replace(os.sep, '/')
+        etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+        content_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        gz = br = None
+        if file_path.endswith(_COMPRESSIBLE_SUFFIXES):
+            compressed = gzip.compress(data, 9)
+            if len(compressed) < len(data):
+                gz = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    br = compressed
+        assets[rel_url] = (data, gz, br, content_type, etag)
+    return assets
+
+
+def _mount_frontend(app, dist_dir: str) -> None:
+    """Serve the built frontend from an in-process byte cache.
+
+    dist is immutable for the process lifetime, so every small asset is
+    preloaded with a strong ETag and served straight from RAM — no open/
+    read/stat per request like StaticFiles. Oversized files fall back to
+    FileResponse, and unknown paths get index.html (SPA routing).
+    """
+    from fastapi import Request
+    from fastapi.responses import FileResponse, Response
+
+    assets = _load_static_assets(dist_dir)
+    dist_real = os.path.realpath(dist_dir)
+
+    @app.get("/{path:path}", include_in_schema=False)
+    def serve_static(path: str, request: Request):
+        asset = assets.get(path or 'index.html')
+        if asset is None:
+            # Large assets are on disk, everything else falls through to
+            # the SPA shell
+            file_path = os.path.realpath(os.path.join(dist_real, path))
+            if file_path.startswith(dist_real + os.sep) and os.path.isfile(file_path):
+                return FileResponse(file_path)
+            asset = assets.get('index.html')
+            if asset is None:
+                return Response(status_code=404)
+
+        data, gz, br, content_type, etag = asset
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers={'ETag': etag})
+        # Vite fingerprints everything under assets/; the HTML shell and
+        # other unhashed files must revalidate instead
+        cache_control = (
+            'public, max-age=31536000, immutable'
+            if path.startswith('assets/') else 'no-cache'
+        )
+        headers = {'ETag': etag, 'Cache-Control': cache_control}
+        if gz is not None or br is not None:
+            headers['Vary'] = 'Accept-Encoding'
+            accept_encoding = request.headers.get('accept-encoding', '')
+            if br is not None and 'br' in accept_encoding:
+                data = br
+                headers['Content-Encoding'] = 'br'
+            elif gz is not None and 'gzip' in accept_encoding:
+                data = gz
+                headers['Content-Encoding'] = 'gzip'
+        return Response(data, media_type=content_type, headers=headers)
+
+
+def create_app():
+    """App factory for uvicorn workers.
+
+    Worker processes import this module fresh, so the wandb directory is
+    handed over via the WANDB_VIEWER_DIR environment variable set in
+    main() before the server starts.
+    """
+    from backend.api import app, init_run_loader
+
+    wandb_dir = os.environ.get("WANDB_VIEWER_DIR")
+    if not wandb_dir:
+        raise RuntimeError("WANDB_VIEWER_DIR is not set; launch via run.py")
+    # Discovery runs off-thread so the worker binds its port immediately;
+    # /api lookups answer 503 until /api/ready reports true
+    init_run_loader(wandb_dir, background=True)
+
+    if os.path.isdir(FRONTEND_DIST):
+        _mount_frontend(app, FRONTEND_DIST)
+    return app
+
+
+def main():
+    args = _parse_argv(sys.argv)
+
+    # Validate wandb directory. abspath is pure string normalization;
+    # resolve() (an lstat per path component) only runs when the path is
+    # actually a symlink
+    wandb_dir = Path(os.path.abspath(args.wandb_dir))
+    if os.path.islink(wandb_dir):
+        wandb_dir = wandb_dir.resolve()
+    # One stat covers both the existence and the directory check
+    try:
+        st = os.stat(wandb_dir)
+    except OSError:
         print(f"Error: Directory does not exist: {wandb_dir}")
         sys.exit(1)
-    
-    if not wandb_dir.is_dir():
+    if not stat.S_ISDIR(st.st_mode):
         print(f"Error: Not a directory: {wandb_dir}")
         sys.exit(1)
     
-    # Check for run directories
-    run_dirs = list(wandb_dir.glob("*run-*"))
-    if not run_dirs:
+    # Check for run directories: one listdir batch plus a substring test per
+    # name. The count only feeds a log line, so the dir-vs-file distinction
+    # isn't worth a stat per entry — RunLoader filters properly later.
+    run_count = sum(1 for name in os.listdir(wandb_dir) if "run-" in name)
+    if not run_count:
         print(f"Warning: No run directories found in {wandb_dir}")
         print("Expected directories matching pattern: run-* or offline-run-*")
     else:
-        print(f"Found {len(run_dirs)} run directories")
+        print(f"Found {run_count} run directories")
     
-    # Import and configure the app
     import uvicorn
-    from backend.api import app, init_run_loader
-    from fastapi.staticfiles import StaticFiles
-    
-    # Initialize the run loader with the wandb directory
-    init_run_loader(wandb_dir)
-    
-    # Mount static files for frontend
-    frontend_dist = Path(__file__).parent / "frontend" / "dist"
-    if frontend_dist.exists():
-        app.mount("/", StaticFiles(directory=str(frontend_dist), html=True), name="frontend")
-        print(f"Serving frontend from {frontend_dist}")
+
+    # Workers re-import this module and build the app via create_app(),
+    # which reads the wandb directory from the environment
+    os.environ["WANDB_VIEWER_DIR"] = str(wandb_dir)
+
+    # Discover once in the parent so the msgpack snapshot on disk is fresh
+    # and hot in the page cache; each worker then loads the shared result
+    # with a single typed decode instead of re-parsing every run N times.
+    # Runs as a daemon thread so binding the port never waits on it.
+    from backend.run_loader import RunLoader
+    import threading
+    threading.Thread(
+        target=lambda: RunLoader(wandb_dir).discover_runs(),
+        name="snapshot-warm", daemon=True,
+    ).start()
+
+    if os.path.isdir(FRONTEND_DIST):
+        print(f"Serving frontend from {FRONTEND_DIST} (cached in memory)")
     else:
         print(f"Note: Frontend not built. Run 'cd frontend && npm run build' first.")
         print(f"API will still be available at http://{args.host}:{args.port}/api/")
     
-    print(f"\n{'='*60}")
-    print(f"  WandB Local Viewer")
-    print(f"  Serving runs from: {wandb_dir}")
-    print(f"  Access at: http://localhost:{args.port}")
-    print(f"{'='*60}\n")
-    print(f"For remote access, forward the port:")
-    print(f"  ssh -L {args.port}:localhost:{args.port} user@server\n")
-    
-    # Run the server
+    # One write (and one syscall under line buffering) instead of a
+    # lock/write/flush cycle per banner line
+    sys.stdout.write(f"""
+{'=' * 60}
+  WandB Local Viewer
+  Serving runs from: {wandb_dir}
+  Access at: http://localhost:{args.port}
+{'=' * 60}
+
+For remote access, forward the port:
+  ssh -L {args.port}:localhost:{args.port} user@server
+
+""")
+    sys.stdout.flush()
+
+
+    # HTTP/2 multiplexes the dashboard's parallel metric fetches over one
+    # connection instead of head-of-line-blocking on six HTTP/1.1 sockets.
+    # uvicorn doesn't speak h2, so this path serves through hypercorn.
+    if args.http2:
+        try:
+            import asyncio
+            import hypercorn.asyncio
+            import hypercorn.config
+        except ImportError:
+            print("Note: --http2 requires the hypercorn package "
+                  "(pip install hypercorn); falling back to HTTP/1.1")
+        else:
+            config = hypercorn.config.Config()
+            config.bind = [f"{args.host}:{args.port}"]
+            config.alpn_protocols = ["h2", "http/1.1"]
+            config.certfile = args.certfile
+            config.keyfile = args.keyfile
+            config.accesslog = None
+            asyncio.run(hypercorn.asyncio.serve(create_app(), config))
+            return
+
+    # Run the server: libuv event loop and the C HTTP parser keep the
+    # per-request hot path out of Python, and skipping the access log
+    # avoids a sync stderr write per request during asset bursts.
+    # Multiple worker processes sidestep the GIL for concurrent viewers;
+    # that requires the factory import string rather than an app object.
     uvicorn.run(
-        app,
+        "run:create_app",
+        factory=True,
         host=args.host,
         port=args.port,
         log_level="info",
+        loop="uvloop" if sys.platform != "win32" else "auto",
+        http="httptools",
+        workers=max(1, args.workers),
+        access_log=False,
     )
 
 